@@ -30,6 +30,7 @@ __all__ = [
 from toasted.enums import ToastElementType, ToastDismissReason
 
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 from enum import Enum
 from typing import (
     Dict,
@@ -45,24 +46,51 @@ from typing import (
 )
 from os import environ, sep
 import sys
-from urllib.parse import urlsplit, urlunsplit, parse_qsl
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, SplitResult
+from urllib.request import url2pathname
 from pathlib import Path
 from base64 import b64decode
 import string
 from io import BytesIO
+from functools import cache, lru_cache
+from importlib import import_module
+from xml.sax.saxutils import escape
 
 from PIL import Image, ImageFont, ImageDraw, ImageColor
 
+
+class LazyModule:
+    """
+    Imports a module on its first attribute access. Used for WinRT namespaces,
+    so they are not activated until a toast actually needs them.
+    """
+
+    def __init__(self, name : str) -> None:
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, attr : str) -> Any:
+        if self.__module is None:
+            self.__module = import_module(self.__name)
+        value = getattr(self.__module, attr)
+        # Store on the instance, so next lookups won't end up here again.
+        setattr(self, attr, value)
+        return value
+
+
 if sys.platform == "win32":
     import winreg
-    from winrt.windows.storage import SystemDataPaths # pyright: ignore[reportMissingImports]
+    storage = LazyModule("winrt.windows.storage")
 else:
     class Proxy:
         def __getattribute__(self, _): raise Exception("Toasted is not supported on non-Windows platforms.") # noqa: E501
-    winreg = SystemDataPaths = Proxy()
+    winreg = storage = Proxy()
 
 T = TypeVar('T')
 
+# Entities to escape in attribute values, in addition to "&", "<" and ">".
+ATTR_ENTITIES = {"\"": "&quot;"}
+
 
 class ToastThemeInfo(NamedTuple):
     contrast : Literal["high", "standard"]
@@ -70,6 +98,16 @@ class ToastThemeInfo(NamedTuple):
     theme : Literal["dark", "light"]
 
 
+@lru_cache(maxsize = 256)
+def split_uri(uri : str) -> Tuple[SplitResult, str]:
+    """
+    Split an URI and get its path part (network location and path combined),
+    results are cached since same URIs are resolved on each build of the toast.
+    """
+    split = urlsplit(uri, allow_fragments = False)
+    return split, (split.netloc + split.path).removeprefix("/")
+
+
 def resolve_uri(
     uri : str,
     allow_remote : bool = False
@@ -77,8 +115,7 @@ def resolve_uri(
     """
     Resolve an file system or remote URI, similar how it is done in UWP apps.
     """
-    split = urlsplit(uri, allow_fragments = False)
-    path_part = (split.netloc + split.path).removeprefix("/")
+    split, path_part = split_uri(uri)
     # https://learn.microsoft.com/en-us/windows/uwp/app-resources/uri-schemes
     # If scheme is "ms-appx", path is relative to current working directory.
     if split.scheme == "ms-appx":
@@ -144,6 +181,19 @@ def resolve_uri(
     )
 
 
+def file_uri_to_path(uri : str) -> str:
+    """
+    Convert a file URI (as returned by resolve_uri and the temporary filesystem)
+    to a file path. Only parses the string, no file system access is made.
+    """
+    split = urlsplit(uri)
+    path = split.path
+    # Network (UNC) paths have their server name in the network location.
+    if split.netloc and (split.netloc != "localhost"):
+        path = "//" + split.netloc + path
+    return url2pathname(path)
+
+
 def is_in_venv() -> bool:
     """
     Returns True if Python is launched in a virtualenv or similar environments.
@@ -176,28 +226,37 @@ def get_theme_query_parameters(
 
 
 def xmldata_to_content(
-    content : Union[None, str, List["XMLData"], "XMLData"]
+    content : Union[None, str, List["XMLData"], "XMLData"],
+    source : Optional[str] = None
 ):
+    """
+    Yield XML fragments of given content. If given content is a XMLData 
+    with "source_replace", the value of that attribute is replaced with "source".
+    """
     if not content:
         yield None
     elif isinstance(content, list):
         for i in content:
-            for j in xmldata_to_content(i):
-                yield j
+            yield from xmldata_to_content(i)
     elif isinstance(content, XMLData):
-        yield "<{0}{1}>".format(content.tag, attrs_to_string(content.attrs or {}))
-        for i in xmldata_to_content(content.content):
-            yield i
+        yield "<{0}{1}>".format(content.tag, attrs_to_string(
+            content.attrs or {}, content.source_replace, source
+        ))
+        yield from xmldata_to_content(content.content)
         yield "</{0}>".format(content.tag)
     else:
-        yield content
+        yield escape(content)
 
 
 def attrs_to_string(
-    attrs : Dict[str, Any]
+    attrs : Dict[str, Any],
+    replace_key : Optional[str] = None,
+    replace_value : Optional[str] = None
 ) -> str:
-    attr = ""
+    attr = []
     for k, v in attrs.items():
+        if k == replace_key:
+            v = replace_value
         value = ""
         if v is None:
             continue
@@ -207,8 +266,17 @@ def attrs_to_string(
             value = str(v.value)
         else:
             value = str(v)
-        attr += " " + k.replace("_", "-") + "=\"" + value.replace("\"", "&quot;") + "\""
-    return attr
+        attr.append(format_attr(k, value))
+    return "".join(attr)
+
+
+@lru_cache(maxsize = 1024)
+def format_attr(key : str, value : str) -> str:
+    """
+    Returns an escaped XML attribute with leading space. Memoized, since 
+    most of the attributes repeat with the same values across toasts.
+    """
+    return " " + key.replace("_", "-") + "=\"" + escape(value, ATTR_ENTITIES) + "\""
 
 
 def xml(element : str, _data : Optional[str] = None, **kwargs) -> str:
@@ -219,6 +287,13 @@ def xml(element : str, _data : Optional[str] = None, **kwargs) -> str:
 
 
 def get_enum(enum : Type[Enum], value : Any, default : T = None) -> Union[Enum, T]:
+    # Look up by value first, since it is the most common case.
+    try:
+        member = enum._value2member_map_.get(value, None)
+    except TypeError:
+        member = None
+    if member is not None:
+        return member
     return next(
         (y for x, y in enum._member_map_.items() if (y.value == value) 
         or (y == value) or (x == value)), default
@@ -293,7 +368,7 @@ def get_icon_fonts_path() -> List[Tuple[Literal["mdl2", "fluent"], Path]]:
         winreg.HKEY_CURRENT_USER, 
         "SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\Fonts"
     )
-    system_fonts_path = Path(SystemDataPaths.get_default().fonts)
+    system_fonts_path = Path(storage.SystemDataPaths.get_default().fonts)
     # Check for system fonts.
     system_fonts_count = winreg.QueryInfoKey(system_fonts)[1]
     for i in range(system_fonts_count):
@@ -321,26 +396,29 @@ def get_query_app_ids(is_user : bool = True) -> Dict[str, Dict[str, Any]]:
     such as its display name and icon.
     """
     output = {}
-    aumids = winreg.OpenKey(
+    with winreg.OpenKeyEx(
         winreg.HKEY_CURRENT_USER if is_user else winreg.HKEY_LOCAL_MACHINE, 
-        "SOFTWARE\\Classes\\AppUserModelId"
-    )
-    key_count = winreg.QueryInfoKey(aumids)[0]
-    for i in range(key_count):
-        app_id = winreg.EnumKey(aumids, i)
-        app_info = winreg.OpenKey(aumids, app_id)
-        values = {}
-        value_count = winreg.QueryInfoKey(app_info)[1]
-        for j in range(value_count):
-            k, v, _ = winreg.EnumValue(app_info, j)
-            values[k] = v
-        output[app_id] = values
+        "SOFTWARE\\Classes\\AppUserModelId",
+        0, winreg.KEY_READ
+    ) as aumids:
+        key_count = winreg.QueryInfoKey(aumids)[0]
+        for i in range(key_count):
+            app_id = winreg.EnumKey(aumids, i)
+            with winreg.OpenKeyEx(aumids, app_id, 0, winreg.KEY_READ) as app_info:
+                values = {}
+                value_count = winreg.QueryInfoKey(app_info)[1]
+                for j in range(value_count):
+                    k, v, _ = winreg.EnumValue(app_info, j)
+                    values[k] = v
+            output[app_id] = values
     return output
 
 
+@cache
 def get_windows_build() -> int:
     """
-    Gets Windows build number.
+    Gets Windows build number. Since it can't change while running, 
+    the value is only read once.
     https://en.wikipedia.org/wiki/List_of_Microsoft_Windows_versions
     """
     return sys.getwindowsversion().build
@@ -380,6 +458,7 @@ class ToastPayload(NamedTuple):
     visual_xml : str
     actions_xml : str
     other_xml : str
+    uses_temp_files : bool = False
 
 
 
@@ -409,12 +488,42 @@ class ToastBase(ABC):
         return cls(**data)
 
 
+class ToastDataView(Mapping):
+    """
+    Read-only mapping of binding values of a toast. Values are 
+    read from the underlying WinRT map only when they are accessed.
+    As it is not a dict, use dict(show_data) to get a copy that can
+    be modified or serialized to JSON.
+    """
+    __slots__ = ("_values", )
+
+    def __init__(self, values : Any) -> None:
+        self._values = values
+
+    def __getitem__(self, key : str) -> str:
+        # WinRT raises an OSError for missing keys.
+        try:
+            return self._values.lookup(key)
+        except OSError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for k, _ in self._values.items():
+            yield k
+
+    def __len__(self) -> int:
+        return self._values.size
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {dict(self._values.items())}>"
+
+
 class ToastResult:
     def __init__(
         self,
         arguments : str,
         inputs : dict,
-        show_data : dict,
+        show_data : Mapping,
         dismiss_reason : ToastDismissReason
     ) -> None:
         self.arguments = arguments
@@ -1,5 +1,6 @@
 from tempfile import TemporaryDirectory, _RandomNameSequence
 from typing import Optional, Dict, Union, Iterator
+from urllib.parse import urlsplit, urlunsplit
 from httpx import Client
 from pathlib import Path
 
@@ -19,6 +20,7 @@ class ToastMediaFileSystem():
             max_redirects = 3
         )
         self.fs_files : Dict[str, str] = {}
+        self.closed : bool = False
 
     def get_rand_name(self) -> str:
         return next(self.random_seq)
@@ -49,9 +51,19 @@ class ToastMediaFileSystem():
     def _download_file(
         self, 
         url : str,
-        query_params : Optional[Dict[str, str]] = None,
+        query_params : Union[Dict[str, str], str, None] = None,
         ignore_fail : bool = True
     ) -> Optional[str]:
+        # An already encoded query string can be merged into the query of the URL
+        # as-is. The URL is split so the query stays before any fragment.
+        if isinstance(query_params, str):
+            if query_params:
+                split = urlsplit(url)
+                url = urlunsplit(split._replace(
+                    query = (split.query + "&" + query_params) \
+                        if split.query else query_params
+                ))
+            query_params = None
         with self.client.stream(
             method = "GET",
             url = url,
@@ -63,16 +75,22 @@ class ToastMediaFileSystem():
             if not resp.is_success:
                 if not ignore_fail:
                     resp.raise_for_status()
+            content_length = resp.headers.get("Content-Length", None)
+            content_length = None if content_length is None else int(content_length)
             # Only allow media smaller than or equal to 3 MB.
             # https://docs.microsoft.com/en-us/windows/apps/design/shell/tiles-and-notifications/send-local-toast?tabs=uwp#adding-images
-            if int(resp.headers["Content-Length"]) > (3 * 1024 * 1024):
+            if (content_length is not None) and (content_length > (3 * 1024 * 1024)):
                 return
-            return self.create_file(resp.iter_bytes(1024), url)
+            # Most of the media is small enough to be read at once, so write it
+            # to the file in a single call instead of many small chunks.
+            if (content_length is not None) and (content_length <= (1024 * 1024)):
+                return self.create_file(resp.read(), url)
+            return self.create_file(resp.iter_bytes(256 * 1024), url)
 
     def get(
         self,
         url : str,
-        query_params : Optional[Dict[str, str]] = None,
+        query_params : Union[Dict[str, str], str, None] = None,
         ignore_fail : bool = True,
         skip_cache : bool = False
     ) -> Optional[str]:
@@ -105,6 +123,9 @@ class ToastMediaFileSystem():
 
 
     def close(self):
+        if self.closed:
+            return
+        self.closed = True
         self.client.close()
         self.fs_files = {}
         self.fs.cleanup()
\ No newline at end of file
@@ -28,14 +28,14 @@ __all__ = [
 from typing import TYPE_CHECKING
 import sys
 
+from toasted.common import LazyModule
+
 if sys.platform == "win32":
-    from winrt.windows.ui.notifications import ( # pyright: ignore[reportMissingImports]
-        ToastNotificationManager
-    )
+    notifications = LazyModule("winrt.windows.ui.notifications")
 else:
     class Proxy:
         def __getattribute__(self, _): raise Exception("Toasted is not supported on non-Windows platforms.") # noqa: E501
-    ToastNotificationManager = Proxy()
+    notifications = Proxy()
 
 if TYPE_CHECKING:
     from toasted.toast import Toast
@@ -54,21 +54,22 @@ class History:
         """
         Removes a (one) toast by its ID, group ID and app ID from history.
         """
-        ToastNotificationManager.get_default().history.remove(toast_id, group_id, app_id) # noqa: E501
+        notifications.ToastNotificationManager.get_default().history.remove(toast_id, group_id, app_id) # noqa: E501
 
     @staticmethod
     def remove_group(group_id : str, app_id : str):
         """
         Removes all (all for group) toasts under given group ID and app ID from history.
         """
-        ToastNotificationManager.get_default().history.remove_group(group_id, app_id)
+        notifications.ToastNotificationManager.get_default().history \
+            .remove_group(group_id, app_id)
 
     @staticmethod
     def clear(app_id : str):
         """
         Removes ALL (all for app) toasts under given app ID from history.
         """
-        ToastNotificationManager.get_default().history.clear(app_id)
+        notifications.ToastNotificationManager.get_default().history.clear(app_id)
 
 
 class HistoryForToast(History):
@@ -26,6 +26,8 @@ from toasted.common import (
     ToastElement,
     ToastPayload,
     ToastThemeInfo,
+    ToastDataView,
+    LazyModule,
     get_enum,
     get_query_app_ids,
     get_windows_build, 
@@ -34,7 +36,8 @@ from toasted.common import (
     resolve_uri,
     get_theme_query_parameters,
     xmldata_to_content,
-    XMLData
+    file_uri_to_path,
+    attrs_to_string
 )
 from toasted.filesystem import ToastMediaFileSystem
 from toasted.history import HistoryForToast
@@ -48,47 +51,70 @@ from toasted.enums import (
 )
 
 import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import cache, partial
+from operator import attrgetter
+from types import MappingProxyType
+from collections.abc import Mapping
 import locale
 import inspect
 import sys
+import threading
+import time
 from typing import (
-    Any, Callable, Dict, Generator, Optional, Tuple, 
-    List, Union, Literal, Set
+    TYPE_CHECKING, Any, Callable, Dict, Generator, Optional, Tuple, 
+    List, Union
 )
-from pathlib import Path
-
-if sys.platform == "win32":
-    import winreg
-    import winsound
-    from ctypes import windll
-
+from urllib.parse import urlencode
+
+# Use the C implementation of ISO 8601 parser if available.
+try:
+    from ciso8601 import parse_datetime  # pyright: ignore[reportMissingImports]
+except ImportError:
+    parse_datetime = datetime.fromisoformat
+
+# Use orjson for decoding JSON documents if available.
+try:
+    from orjson import loads as json_loads  # pyright: ignore[reportMissingImports]
+except ImportError:
+    from json import loads as json_loads
+
+# WinRT types are only imported for annotations, see LazyModule below for runtime.
+if TYPE_CHECKING:
     from winrt.system import Object  # pyright: ignore[reportMissingImports]
-    from winrt.windows.foundation import IPropertyValue, EventRegistrationToken  # pyright: ignore[reportMissingImports]
-    from winrt.windows.ui.viewmanagement import (  # pyright: ignore[reportMissingImports]
-        AccessibilitySettings, 
-        UISettings, 
-        UIColorType
-    )
-    import winrt.windows.data.xml.dom as dom  # pyright: ignore[reportMissingImports]
+    from winrt.windows.foundation import EventRegistrationToken  # pyright: ignore[reportMissingImports]
+    from winrt.windows.data.xml.dom import XmlDocument  # pyright: ignore[reportMissingImports]
     from winrt.windows.ui.notifications import (  # pyright: ignore[reportMissingImports]
         ToastNotification, 
-        ToastNotificationManager, 
-        ToastActivatedEventArgs, 
         ToastDismissedEventArgs, 
         ToastFailedEventArgs,
         ToastNotifier,
-        NotificationSetting,
         NotificationData
     )
+
+if sys.platform == "win32":
+    import winreg
+    import winsound
+    from ctypes import windll
+
+    # WinRT namespaces are imported on first use, as activating them takes
+    # a while and not all of them are needed for building a toast.
+    foundation = LazyModule("winrt.windows.foundation")
+    viewmanagement = LazyModule("winrt.windows.ui.viewmanagement")
+    dom = LazyModule("winrt.windows.data.xml.dom")
+    notifications = LazyModule("winrt.windows.ui.notifications")
+
+    # Flags for playing custom sounds with winsound.
+    SOUND_FLAGS = winsound.SND_FILENAME | winsound.SND_NODEFAULT | winsound.SND_ASYNC
+    SOUND_FLAGS_LOOP = SOUND_FLAGS | winsound.SND_LOOP
 else:
     class Proxy:
         def __getattribute__(self, _): raise Exception("Toasted is not supported on non-Windows platforms.") # noqa: E501
-    winreg = winsound = windll = Object = IPropertyValue = \
-    EventRegistrationToken = AccessibilitySettings = UISettings = UIColorType = \
-    dom = ToastNotification = ToastNotificationManager = ToastActivatedEventArgs = \
-    ToastDismissedEventArgs = ToastFailedEventArgs = ToastNotifier = \
-    NotificationSetting = NotificationData = Proxy()
+    winreg = winsound = windll = foundation = viewmanagement = dom = \
+    notifications = Proxy()
+    SOUND_FLAGS = SOUND_FLAGS_LOOP = 0
 
 ToastDataType = Dict[str, str]
 ToastResultCallbackType = Optional[Callable[[ToastResult], None]]
@@ -100,10 +126,51 @@ ToastElementsListType = List[ToastElementTreeType]
 ToastElementTreeJSONType = Union[Dict[str, Any], List["ToastElementTreeJSONType"]]
 ToastElementsListJSONType = List[ToastElementTreeJSONType]
 
-LEVEL_START = "LEVEL_START"
-LEVEL_END = "LEVEL_END"
+# Shared (and read-only) show data of toasts that has shown without any data.
+EMPTY_DATA = MappingProxyType({})
+
+# Getters of the method to add and remove a WinRT toast event and 
+# the Toast method that handles the event.
+TOAST_EVENT_HOOKS = tuple(
+    (attrgetter(x), attrgetter(y), attrgetter(z), ) for x, y, z in (
+        ("add_activated", "remove_activated", "_handle_toast_activated"),
+        ("add_dismissed", "remove_dismissed", "_handle_toast_dismissed"),
+        ("add_failed", "remove_failed", "_handle_toast_failed")
+    )
+)
+
+# Dismiss reasons mapped by their values.
+DISMISS_REASONS = ToastDismissReason._value2member_map_
+
+# Kinds of the events yielded by Toast._walk_elements.
+WALK_ELEMENT = 0
+WALK_LEVEL_START = 1
+WALK_LEVEL_END = 2
+
+ToastElementWalkEventType = Tuple[int, Union[ToastElement, str]]
+
+# Registry key that app IDs (AUMIDs) are registered under for current user.
+APP_ID_REGISTRY_KEY = "SOFTWARE\\Classes\\AppUserModelId\\"
 
-ToastElementWalkLevelType = Literal["LEVEL_START", "LEVEL_END"]
+# Prefix of the sounds that comes with the Windows. (see ToastSound)
+WINDOWS_SOUND_PREFIX = "ms-winsoundevent:"
+
+# URI prefixes of media sources that needs to be downloaded.
+REMOTE_URI_PREFIXES = ("http://", "https://", )
+
+# Outer structure of the toast XML, filled by Toast._payload_to_xml_string.
+TOAST_XML_TEMPLATE = (
+    "<toast{toast_attrs}>"
+    "<visual{visual_attrs}>"
+    "<binding template=\"ToastGeneric\">{visual}</binding>"
+    "</visual>"
+    "{actions}{other}"
+    "</toast>"
+)
+
+# Opening and closing tags for each nesting level, indexed by the level.
+LEVEL_TAGS_START = ("", "<group>", "<subgroup>", )
+LEVEL_TAGS_END = ("", "</group>", "</subgroup>", )
 
 class Toast:
     """
@@ -201,6 +268,9 @@ class Toast:
     """
 
     _current_app_id : Optional[str] = None
+    _theme_cache : Optional[Tuple[float, ToastThemeInfo]] = None
+    _theme_params_cache : Dict[ToastThemeInfo, str] = {}
+    _notifier_cache : Dict[str, "ToastNotifier"] = {}
 
     __slots__ = (
         "duration",
@@ -219,18 +289,25 @@ class Toast:
         "toast_id",
         "_callback_result",
         "_callback_show",
+        "_callback_show_is_async",
         "_imp_manager",
         "_imp_toast",
         "_xml_mute_sound",
+        "_xml_cache",
         "_fs"
     )
 
     _exclude_copy = (
         "_fs",
         "_toast_result",
-        "_xml_mute_sound"
+        "_xml_mute_sound",
+        "_xml_cache"
     )
 
+    # Slots that are copied by __copy__, set after the class has been created.
+    _copy_slots : Tuple[str, ...]
+    _copy_getter : Callable[["Toast"], Tuple[Any, ...]]
+
     def __init__(
         self, 
         arguments : Optional[str] = None,
@@ -248,7 +325,6 @@ class Toast:
         expiration_time : Optional[datetime] = None,
         app_id : Optional[str] = None
     ) -> None:
-        super().__init__()
         self.elements : ToastElementsListType = []
         self.duration = duration
         self.arguments = arguments
@@ -266,9 +342,11 @@ class Toast:
         self.app_id = app_id
         self._callback_result : ToastResultCallbackType = None
         self._callback_show : ToastShowCallbackType = None
+        self._callback_show_is_async : bool = False
         self._imp_manager : "ToastNotifier" = None
         self._imp_toast : "ToastNotification" = None
         self._xml_mute_sound : bool = False
+        self._xml_cache : Optional[Tuple[tuple, ToastPayload, "XmlDocument"]] = None
         self._fs : Optional[ToastMediaFileSystem] = None
 
 
@@ -294,10 +372,12 @@ class Toast:
         """
         if function:
             self._callback_show = function
+            self._callback_show_is_async = inspect.iscoroutinefunction(function)
             return function
         else:
             def decorator(func : Callable):
                 self._callback_show = func
+                self._callback_show_is_async = inspect.iscoroutinefunction(func)
                 return func
             return decorator
 
@@ -309,95 +389,79 @@ class Toast:
         """
         Walk elements and convert them to XML recursively.
         """
-        params = None if not self.add_query_params else get_theme_query_parameters(
-            info = self.get_theme_info()
-        )
-        visual, actions, other = ("", ) * 3
-        current_level = 0
-        using_custom_style : bool = False
+        fs = None
         if download_media:
-            if self._fs:
-                self._fs.close()
-            self._fs = ToastMediaFileSystem()
-        for el in self._walk_elements(self.elements):
-            if el in [LEVEL_START, LEVEL_END]:
-                is_end = el == LEVEL_END
-                if not is_end:
-                    current_level += 1
-                if current_level > 2:
-                    raise ValueError(
-                        "Toasts doesn't support nested elements other " +
-                        "than groups and subgroups."
-                    )
-                elif current_level == 1:
-                    visual += f"<{'/' if is_end else ''}group>"
-                elif current_level == 2:
-                    visual += f"<{'/' if is_end else ''}subgroup>"
-                if is_end:
-                    current_level -= 1
+            self._close_fs()
+            fs = self._fs = ToastMediaFileSystem()
+        return self._create_payload(fs)
+
+
+    def _create_payload(
+        self,
+        fs : Optional[ToastMediaFileSystem]
+    ) -> ToastPayload:
+        """
+        Builds the payload. Data and remote media sources are written to the given
+        temporary filesystem, and left unresolved if there is none. The filesystem
+        is given by the caller, so building doesn't touch the state of the toast.
+        """
+        params = None if not self.add_query_params else self._get_theme_params()
+        visual : List[str] = []
+        actions : List[str] = []
+        other : List[str] = []
+        # Where to put the XML of an element, mapped by type of the element.
+        buffers = {
+            ToastElementType.VISUAL: visual,
+            ToastElementType.ACTION: actions,
+            ToastElementType.HEADER: other
+        }
+        using_custom_style : bool = False
+        uses_temp_files : bool = False
+        # Resolved media of URIs, as same source may be used more than once.
+        media : Dict[str, Tuple[str, bool]] = {}
+        resolve_media = partial(self._resolve_media, params = params, fs = fs)
+        if (fs is not None) and self.remote_media:
+            self._prefetch_remote_media(resolve_media, media)
+        for kind, el in self._walk_elements(self.elements):
+            # Group and subgroup events come with their tag.
+            if kind != WALK_ELEMENT:
+                visual.append(el)
             else:
                 xmldata = el.to_xml_data()
-                xmlcontent = ""
                 override = ""
                 if xmldata.source_replace:
                     source_uri = xmldata.attrs[xmldata.source_replace]
                     if source_uri:
-                        resolved = resolve_uri(source_uri, self.remote_media)
-                        if isinstance(resolved, bytes):
-                            if download_media:
-                                override = self._fs.put(resolved)
-                        elif isinstance(resolved, str):
-                            if download_media:
-                                override = self._fs.get(
-                                    url = resolved,
-                                    query_params = params
-                                )
-                        else:
-                            override = resolved.resolve().as_uri()
-                    for c in xmldata_to_content(XMLData(
-                        tag = xmldata.tag,
-                        content = xmlcontent,
-                        attrs = {
-                            **(xmldata.attrs or {}), 
-                            xmldata.source_replace : override or None
-                        }
-                    )):
-                        xmlcontent += c or ""
-                else:
-                    for c in xmldata_to_content(xmldata):
-                        xmlcontent += c or ""
-                if el._etype == ToastElementType.ACTION:
-                    actions += xmlcontent
-                elif el._etype == ToastElementType.VISUAL:
-                    visual += xmlcontent
-                else:
-                    other += xmlcontent
+                        resolved = media.get(source_uri, None)
+                        if resolved is None:
+                            resolved = media[source_uri] = resolve_media(source_uri)
+                        override, is_temp = resolved
+                        uses_temp_files = uses_temp_files or is_temp
+                xmlcontent = "".join(
+                    filter(None, xmldata_to_content(xmldata, override or None))
+                )
+                etype = el._etype
+                buffers[etype].append(xmlcontent)
                 # Enable custom styles on the toast
                 # if button has a custom style.
-                if xmldata.attrs.get("hint-buttonStyle", None):
+                if (etype is ToastElementType.ACTION) and \
+                    xmldata.attrs.get("hint-buttonStyle", None):
                     using_custom_style = True
-        other += xml(
+        uses_custom_sound = self.uses_custom_sound
+        other.append(xml(
             "audio", 
-            src = self.sound if self.uses_windows_sound else None,
+            # A sound that is set and not custom is a Windows sound.
+            src = self.sound if (self.sound and not uses_custom_sound) else None,
             # If custom sound has provided, mute the original 
             # toast sound to None since we use our own sound solution.
-            silent = self._xml_mute_sound or self.uses_custom_sound,
+            silent = self._xml_mute_sound or uses_custom_sound,
             loop = self.sound_loop
-        )
+        ))
         custom_sound_file : str = ""
-        if self.uses_custom_sound:
-            resolved = resolve_uri(self.sound, self.remote_media)
-            if isinstance(resolved, bytes):
-                if download_media:
-                    custom_sound_file = self._fs.put(resolved)
-            elif isinstance(resolved, str):
-                if download_media:
-                    custom_sound_file = self._fs.get(
-                        url = resolved,
-                        query_params = params
-                    )
-            else:
-                custom_sound_file = resolved.resolve().as_uri()
+        if uses_custom_sound:
+            custom_sound_file, is_temp = \
+                media.get(self.sound, None) or resolve_media(self.sound)
+            uses_temp_files = uses_temp_files or is_temp
         return ToastPayload(
             uses_custom_style = using_custom_style or None,
             custom_sound_file = custom_sound_file,
@@ -406,29 +470,86 @@ class Toast:
             duration = None if not self.duration else self.duration.value,
             scenario = None if not self.scenario else self.scenario.value,
             timestamp = (None if not self.timestamp else self.timestamp.isoformat()),
-            visual_xml = visual,
-            actions_xml = actions,
-            other_xml = other
+            visual_xml = "".join(visual),
+            actions_xml = "".join(actions),
+            other_xml = "".join(other),
+            uses_temp_files = uses_temp_files
         )
 
 
+    def _resolve_media(
+        self,
+        uri : str,
+        params : Optional[str],
+        fs : Optional[ToastMediaFileSystem]
+    ) -> Tuple[str, bool]:
+        """
+        Resolve a media URI to a file URI. Data and remote URIs are written to the
+        given temporary filesystem, so they are only resolved if there is one.
+        Also returns True if the resulting file is a temporary file.
+        """
+        # Remote URIs are left as-is by resolve_uri when they are allowed,
+        # so there is nothing to resolve if they won't be downloaded anyway.
+        if (fs is None) and self.remote_media and \
+            uri.startswith(REMOTE_URI_PREFIXES):
+            return "", False,
+        resolved = resolve_uri(uri, self.remote_media)
+        resolved_type = type(resolved)
+        if resolved_type is bytes:
+            if fs is None:
+                return "", False,
+            return fs.put(resolved), True,
+        elif resolved_type is str:
+            if fs is None:
+                return "", False,
+            return fs.get(url = resolved, query_params = params) or "", True,
+        return resolved.resolve().as_uri(), False,
+
+
+    def _prefetch_remote_media(
+        self,
+        resolve_media : Callable[[str], Tuple[str, bool]],
+        media : Dict[str, Tuple[str, bool]]
+    ) -> None:
+        """
+        Download remote media sources of the toast concurrently and put them in
+        the given dictionary of resolved media, so they are not downloaded one 
+        after another while building the payload.
+        """
+        uris = set()
+        for kind, el in self._walk_elements(self.elements):
+            if kind == WALK_ELEMENT:
+                xmldata = el.to_xml_data()
+                if xmldata.source_replace:
+                    uri = xmldata.attrs[xmldata.source_replace]
+                    if uri and uri.startswith(REMOTE_URI_PREFIXES):
+                        uris.add(uri)
+        if self.uses_custom_sound and self.sound.startswith(REMOTE_URI_PREFIXES):
+            uris.add(self.sound)
+        # Nothing to overlap if there is only one download.
+        if len(uris) < 2:
+            return
+        uris = list(uris)
+        with ThreadPoolExecutor(max_workers = min(len(uris), 8)) as executor:
+            media.update(zip(uris, executor.map(resolve_media, uris)))
+
+
     @staticmethod
     def _payload_to_xml_string(payload : ToastPayload):
-        return xml("toast",
-                xml("visual", 
-                    xml("binding", payload.visual_xml, template = "ToastGeneric"),
-                    baseUri = payload.base_path
-                ) + (
-                    "" if not payload.actions_xml else \
-                    xml("actions", payload.actions_xml)
-                ) + \
-            payload.other_xml,
-            launch = payload.arguments,
-            duration = payload.duration,
-            scenario = payload.scenario,
-            displayTimestamp = payload.timestamp,
-            useButtonStyle = payload.uses_custom_style
-        )
+        return TOAST_XML_TEMPLATE.format_map({
+            "toast_attrs": attrs_to_string({
+                "launch": payload.arguments,
+                "duration": payload.duration,
+                "scenario": payload.scenario,
+                "displayTimestamp": payload.timestamp,
+                "useButtonStyle": payload.uses_custom_style
+            }),
+            "visual_attrs": attrs_to_string({"baseUri": payload.base_path}),
+            "visual": payload.visual_xml,
+            "actions": 
+                "" if not payload.actions_xml else xml("actions", payload.actions_xml),
+            "other": payload.other_xml
+        })
 
 
     def to_xml_string(
@@ -475,25 +596,27 @@ class Toast:
                     else "can't be empty."
                 )
             )
-        key = winreg.CreateKey(
-            winreg.HKEY_CURRENT_USER, "SOFTWARE\\Classes\\AppUserModelId\\" + handle
-        )
-        winreg.SetValueEx(
-            key, "DisplayName", 0, winreg.REG_EXPAND_SZ, 
-            display_name or handle
-        )
-        winreg.SetValueEx(
-            key, "IconBackgroundColor", 0, winreg.REG_SZ, 
-            (icon_background_color or "#00000000").replace("#", "")
-        )
-        winreg.SetValueEx(
-            key, "IconUri", 0, winreg.REG_SZ, 
-            icon_uri
-        )
-        winreg.SetValueEx(
-            key, "ShowInSettings", 0, winreg.REG_DWORD, 
-            int(show_in_settings)
-        )
+        with winreg.CreateKeyEx(
+            winreg.HKEY_CURRENT_USER, APP_ID_REGISTRY_KEY + handle, 
+            0, winreg.KEY_WRITE
+        ) as key:
+            winreg.SetValueEx(
+                key, "DisplayName", 0, winreg.REG_EXPAND_SZ, 
+                display_name or handle
+            )
+            winreg.SetValueEx(
+                key, "IconBackgroundColor", 0, winreg.REG_SZ, 
+                icon_background_color.lstrip("#") if icon_background_color 
+                else "00000000"
+            )
+            winreg.SetValueEx(
+                key, "IconUri", 0, winreg.REG_SZ, 
+                icon_uri
+            )
+            winreg.SetValueEx(
+                key, "ShowInSettings", 0, winreg.REG_DWORD, 
+                int(show_in_settings)
+            )
         return handle
 
 
@@ -511,7 +634,7 @@ class Toast:
         """
         winreg.DeleteKey(
             winreg.HKEY_CURRENT_USER, 
-            "SOFTWARE\\Classes\\AppUserModelId\\" + handle
+            APP_ID_REGISTRY_KEY + handle
         )
     
 
@@ -526,13 +649,14 @@ class Toast:
                 A unique ID that identifies the app.
         """
         try:
-            winreg.OpenKey(
+            with winreg.OpenKeyEx(
                 winreg.HKEY_CURRENT_USER, 
-                "SOFTWARE\\Classes\\AppUserModelId\\" + handle
-            )
+                APP_ID_REGISTRY_KEY + handle,
+                0, winreg.KEY_READ
+            ):
+                return True
         except FileNotFoundError:
             return False
-        return True
 
 
     @property
@@ -542,9 +666,8 @@ class Toast:
         Otherwise, False.
         """
         try:
-            return \
-                ToastNotificationManager.create_toast_notifier(self.app_id).setting \
-                == NotificationSetting.ENABLED
+            return self._get_notifier(self.app_id).setting == \
+                notifications.NotificationSetting.ENABLED
         except OSError as e:
             if e.winerror == -2147023728:
                 # App ID is not registered in the registry.
@@ -558,18 +681,14 @@ class Toast:
         """
         Returns True if the toast uses a file or a URL as a toast sound.
         """
-        if self.sound and not self.sound.startswith("ms-winsoundevent:"):
-            return True
-        return False
+        return bool(self.sound) and not self.sound.startswith(WINDOWS_SOUND_PREFIX)
 
     @property
     def uses_windows_sound(self) -> bool:
         """
         Returns True if the toast uses sound that comes with the Windows.
         """
-        if self.sound and self.sound.startswith("ms-winsoundevent:"):
-            return True
-        return False
+        return bool(self.sound) and self.sound.startswith(WINDOWS_SOUND_PREFIX)
 
 
     @property
@@ -588,13 +707,13 @@ class Toast:
                 or an AUMID in "CompanyName.ProductName.SubProduct.VersionInformation" 
                 format, (last section, "VersionInformation" is optional)
         """
-        if value != Toast._current_app_id:
-            Toast._current_app_id = value or sys.executable
-            # https://learn.microsoft.com/en-us/windows/win32/api/shobjidl_core/nf-shobjidl_core-setcurrentprocessexplicitappusermodelid
-            # https://stackoverflow.com/a/1552105
-            windll.shell32.SetCurrentProcessExplicitAppUserModelID(
-                value or sys.executable
-            )
+        resolved = value or sys.executable
+        if resolved == Toast._current_app_id:
+            return
+        Toast._current_app_id = resolved
+        # https://learn.microsoft.com/en-us/windows/win32/api/shobjidl_core/nf-shobjidl_core-setcurrentprocessexplicitappusermodelid
+        # https://stackoverflow.com/a/1552105
+        windll.shell32.SetCurrentProcessExplicitAppUserModelID(resolved)
 
     @staticmethod
     def list_app_ids() -> List[Tuple[str, Optional[str], Optional[str]]]:
@@ -602,12 +721,11 @@ class Toast:
         Get a list of all app IDs and their display name and icons 
         are reigstered for current user and system.
         """
-        output = []
-        for k, v in get_query_app_ids(is_user = True).items():
-            output.append((k, v.get("DisplayName"), v.get("IconUri"), ))
-        for k, v in get_query_app_ids(is_user = False).items():
-            output.append((k, v.get("DisplayName"), v.get("IconUri"), ))
-        return output
+        return [
+            (k, v.get("DisplayName"), v.get("IconUri"), )
+            for is_user in (True, False)
+            for k, v in get_query_app_ids(is_user = is_user).items()
+        ]
 
     @property
     def history(self) -> HistoryForToast:
@@ -626,7 +744,8 @@ class Toast:
         # Not all versions support this.
         try:
             return ToastNotificationMode(
-                ToastNotificationManager.get_default().notification_mode.value
+                notifications.ToastNotificationManager.get_default() \
+                    .notification_mode.value
             )
         except AttributeError:
             return ToastNotificationMode.FEATURE_NOT_AVAILABLE
@@ -636,16 +755,23 @@ class Toast:
     def get_theme_info() -> ToastThemeInfo:
         """
         Get information about theme and language setting which is currently
-        set on Windows.
+        set on Windows. The result is cached for a second, since querying
+        it requires several WinRT calls.
         """
-        color = UISettings().get_color_value(UIColorType.BACKGROUND)
-        lang = locale.windows_locale[windll.kernel32.GetUserDefaultUILanguage()]
-        high_contrast = AccessibilitySettings().high_contrast
-        return ToastThemeInfo(
+        now = time.monotonic()
+        if Toast._theme_cache and ((now - Toast._theme_cache[0]) < 1.0):
+            return Toast._theme_cache[1]
+        color = viewmanagement.UISettings().get_color_value(
+            viewmanagement.UIColorType.BACKGROUND
+        )
+        high_contrast = viewmanagement.AccessibilitySettings().high_contrast
+        info = ToastThemeInfo(
             contrast = "high" if high_contrast else "standard",
-            lang = lang.lower().replace("_", "-"),
-            theme = "dark" if (color.g + color.r + color.b) == 0 else "light"
+            lang = Toast._get_ui_language(),
+            theme = "light" if (color.r or color.g or color.b) else "dark"
         )
+        Toast._theme_cache = (now, info, )
+        return info
 
 
     def hide(self) -> None:
@@ -656,7 +782,7 @@ class Toast:
         # then we are sure that toast never displayed before.
         if (not self._imp_toast) or (not self._imp_manager):
             return
-        self._fs.close()
+        self._close_fs()
         winsound.PlaySound(None, 4)
         self._imp_manager.hide(self._imp_toast)
 
@@ -703,6 +829,24 @@ class Toast:
         return update_result == 0
 
 
+    async def update_async(
+        self,
+        data : ToastDataType,
+        missing_ok : bool = False
+    ) -> bool:
+        """
+        Same as update(), but runs the update in a separate thread, so the event loop
+        is not blocked while Windows is updating the notification.
+
+        Parameters:
+            data:
+                Dictionary of binding keys and their values to replace with.
+            missing_ok:
+                If True, no exceptions will be raised when notification was not found.
+        """
+        return await asyncio.to_thread(self.update, data, missing_ok)
+
+
     async def show(
         self,
         data : Optional[ToastDataType] = None,
@@ -724,48 +868,36 @@ class Toast:
                 notification sounds without needing to change Toast.sound attribute for
                 each time.
         """
-        event_loop, futures, tokens, custom_sound = self._set_toast_manager(
+        event_loop, future, tokens, custom_sound = await self._set_toast_manager(
             mute_sound, data
         )
-        self._imp_manager.show(self._imp_toast)
-        # If sound is custom, play with winsound.
-        if custom_sound:
-            if mute_sound:
-                winsound.PlaySound(None, 4)
-            else:
-                winsound.PlaySound(
-                    Path(custom_sound).resolve().as_posix(), 
-                    winsound.SND_FILENAME + winsound.SND_NODEFAULT + \
-                    winsound.SND_ASYNC + \
-                    (winsound.SND_LOOP if self.sound_loop else 0)
-                )
-        # Execute show handler.
-        if self._callback_show:
-            if inspect.iscoroutinefunction(self._callback_show):
-                await self._callback_show(data)
-            else:
-                event_loop.call_soon_threadsafe(
-                    self._callback_show, data
-                )
         try:
-            done, pending = await asyncio.wait(
-                futures, return_when = asyncio.FIRST_COMPLETED
-            )
-            for p in pending:
-                p.cancel()
-            for d in done:
-                return d.result()
+            self._imp_manager.show(self._imp_toast)
+            # If sound is custom, play with winsound.
+            if custom_sound:
+                if mute_sound:
+                    winsound.PlaySound(None, 4)
+                else:
+                    winsound.PlaySound(
+                        file_uri_to_path(custom_sound), 
+                        SOUND_FLAGS_LOOP if self.sound_loop else SOUND_FLAGS
+                    )
+            # Execute show handler.
+            if self._callback_show:
+                if self._callback_show_is_async:
+                    await self._callback_show(data)
+                else:
+                    event_loop.call_soon_threadsafe(
+                        self._callback_show, data
+                    )
+            return await future
         except asyncio.CancelledError:
             self.hide()
         finally:
-            for i, t in enumerate(tokens):
-                if i == 0:
-                    self._imp_toast.remove_activated(t)
-                elif i == 1:
-                    self._imp_toast.remove_dismissed(t)
-                elif i == 2:
-                    self._imp_toast.remove_failed(t)
-            
+            future.cancel()
+            for remove, token in tokens:
+                remove(token)
+
 
     # --------------------
     # Private
@@ -774,36 +906,95 @@ class Toast:
     def _create_future_toast_event(
         self,
         loop : asyncio.AbstractEventLoop, 
-        method_name : str, 
-        hook_name : str
-    ) -> Tuple[asyncio.Future, "EventRegistrationToken"]:
-        future = loop.create_future()
-        token : EventRegistrationToken = getattr(self._imp_toast, hook_name)(
-            lambda sender, event_args: \
-            loop.call_soon_threadsafe(
-                future.set_result, getattr(self, method_name)(sender, event_args)
+        future : asyncio.Future,
+        handler : Callable[["ToastNotification", "Object"], ToastResult],
+        hook : Callable[[Callable], "EventRegistrationToken"]
+    ) -> "EventRegistrationToken":
+        # Only enqueue the event from the WinRT callback thread, the handler
+        # itself is executed on the event loop by _dispatch_toast_event.
+        return hook(
+            partial(
+                self._enqueue_toast_event, loop, threading.get_ident(),
+                future, handler
             )
         )
-        return future, token,
 
 
-    def _set_toast_manager(
+    @classmethod
+    def _enqueue_toast_event(
+        cls,
+        loop : asyncio.AbstractEventLoop,
+        loop_thread_id : int,
+        future : asyncio.Future,
+        handler : Callable[["ToastNotification", "Object"], ToastResult],
+        sender : "ToastNotification",
+        event_args : "Object"
+    ) -> None:
+        # WinRT usually fires events from its own threads, but when it is
+        # the thread of the event loop, there is no need to wake the loop up.
+        # Toasted doesn't use any context variables, so each event runs in a new
+        # empty context instead of a copy of the current one.
+        if threading.get_ident() == loop_thread_id:
+            loop.call_soon(
+                cls._dispatch_toast_event, future, handler, sender, event_args,
+                context = contextvars.Context()
+            )
+        else:
+            loop.call_soon_threadsafe(
+                cls._dispatch_toast_event, future, handler, sender, event_args,
+                context = contextvars.Context()
+            )
+
+
+    @staticmethod
+    def _dispatch_toast_event(
+        future : asyncio.Future,
+        handler : Callable[["ToastNotification", "Object"], ToastResult],
+        sender : "ToastNotification",
+        event_args : "Object"
+    ) -> None:
+        if future.done():
+            return
+        try:
+            future.set_result(handler(sender, event_args))
+        except Exception as e:
+            future.set_exception(e)
+
+
+    async def _set_toast_manager(
         self,
         mute_sound : bool = False,
         data : Optional[ToastDataType] = None
     ) -> Tuple[
         asyncio.AbstractEventLoop, 
-        Set[asyncio.Future], 
-        Set["EventRegistrationToken"],
+        asyncio.Future, 
+        Tuple[Tuple[
+            Callable[["EventRegistrationToken"], None], 
+            "EventRegistrationToken"
+        ], ...],
         str
     ]:
-        self._imp_manager = ToastNotificationManager.create_toast_notifier(self.app_id)
+        self._imp_manager = self._get_notifier(self.app_id)
         event_loop = asyncio.get_running_loop()
         self._xml_mute_sound = mute_sound
-        xml = dom.XmlDocument()
-        payload = self.get_payload(download_media = True)
-        xml.load_xml(self._payload_to_xml_string(payload))
-        self._imp_toast = ToastNotification(xml)
+        # Re-use the previously built XML document if nothing that affects
+        # the payload has changed since the last show().
+        cache_key = self._get_payload_key()
+        if self._xml_cache and (self._xml_cache[0] == cache_key):
+            _, payload, xml = self._xml_cache
+        else:
+            # Building the payload may download media and render icons, so
+            # do it in a thread to not block the event loop meanwhile.
+            payload, xml_string, fs = await asyncio.to_thread(self._build_payload_xml)
+            self._close_fs()
+            self._fs = fs
+            xml = dom.XmlDocument()
+            xml.load_xml(xml_string)
+            # Temporary files are deleted once the toast has been dismissed,
+            # so payloads that point to them can't be used again.
+            self._xml_cache = \
+                None if payload.uses_temp_files else (cache_key, payload, xml, )
+        self._imp_toast = notifications.ToastNotification(xml)
         if data:
             self._imp_toast.data = self._build_notification_data(data)
         if self.group_id:
@@ -814,20 +1005,84 @@ class Toast:
             self._imp_toast.tag = self.toast_id
         self._imp_toast.suppress_popup = not self.show_popup
         self._imp_toast.expiration_time = self.expiration_time
-        # Create handlers.
-        futures = set()
-        tokens = set()
-        for k, v in (
-            ("add_activated", "_handle_toast_activated"),
-            ("add_dismissed", "_handle_toast_dismissed"),
-            ("add_failed", "_handle_toast_failed")
-        ):
-            fut, tok = self._create_future_toast_event(
-                loop = event_loop, method_name = v, hook_name = k
+        # Create handlers. All of them resolve the same future, since only
+        # one of these events will be fired for a toast.
+        future = event_loop.create_future()
+        tokens = tuple(
+            (
+                get_unhook(self._imp_toast),
+                self._create_future_toast_event(
+                    loop = event_loop, future = future, 
+                    handler = get_handler(self), hook = get_hook(self._imp_toast)
+                ),
+            ) for get_hook, get_unhook, get_handler in TOAST_EVENT_HOOKS
+        )
+        return event_loop, future, tokens, payload.custom_sound_file,
+
+
+    @staticmethod
+    def _get_notifier(app_id : str) -> "ToastNotifier":
+        """
+        Returns a toast notifier for given app ID, creating it only on first use.
+        """
+        notifier = Toast._notifier_cache.get(app_id, None)
+        if notifier is None:
+            notifier = \
+                notifications.ToastNotificationManager.create_toast_notifier(app_id)
+            Toast._notifier_cache[app_id] = notifier
+        return notifier
+
+
+    @staticmethod
+    @cache
+    def _get_ui_language() -> str:
+        """
+        Returns the display language of the user in "en-us" format. 
+        Changing it requires signing out, so it is only read once.
+        """
+        lang = locale.windows_locale[windll.kernel32.GetUserDefaultUILanguage()]
+        return lang.lower().replace("_", "-")
+
+
+    @staticmethod
+    def _get_theme_params() -> str:
+        """
+        Returns the theme query parameters as an encoded query string.
+        """
+        info = Toast.get_theme_info()
+        params = Toast._theme_params_cache.get(info, None)
+        if params is None:
+            params = urlencode(get_theme_query_parameters(info = info))
+            Toast._theme_params_cache[info] = params
+        return params
+
+
+    def _build_payload_xml(self) -> Tuple[ToastPayload, str, ToastMediaFileSystem]:
+        # Runs in a worker thread, so the filesystem is only assigned to the toast
+        # on the event loop, where handlers and hide() may close the previous one.
+        fs = ToastMediaFileSystem()
+        try:
+            payload = self._create_payload(fs)
+        except BaseException:
+            fs.close()
+            raise
+        return payload, self._payload_to_xml_string(payload), fs,
+
+
+    def _get_payload_key(self) -> tuple:
+        """
+        Returns a comparable snapshot of everything that affects the payload,
+        without resolving any media sources.
+        """
+        return (
+            self.arguments, self.duration, self.scenario, self.timestamp,
+            self.base_path, self.sound, self.sound_loop, self.remote_media,
+            self.add_query_params, self._xml_mute_sound,
+            tuple(
+                el.to_xml_data() if kind == WALK_ELEMENT else el
+                for kind, el in self._walk_elements(self.elements)
             )
-            futures.add(fut)
-            tokens.add(tok)
-        return event_loop, futures, tokens, payload.custom_sound_file,
+        )
 
 
     def _handle_toast_activated(
@@ -835,16 +1090,17 @@ class Toast:
         toast : "ToastNotification", 
         args : "Object"
     ):
-        self._fs.close()
-        eventargs = ToastActivatedEventArgs._from(args)
-        inputs = {}
-        if eventargs.user_input:
-            for x, y in eventargs.user_input.items():
-                inputs[x] = IPropertyValue._from(y).get_string()
+        self._close_fs()
+        eventargs = notifications.ToastActivatedEventArgs._from(args)
+        user_input = eventargs.user_input
+        from_value = foundation.IPropertyValue._from
+        inputs = {
+            x: from_value(y).get_string() for x, y in user_input.items()
+        } if user_input else {}
         result = ToastResult(
             arguments = eventargs.arguments,
             inputs = inputs,
-            show_data = {} if not toast.data else dict(toast.data.values.items()),
+            show_data = self._get_show_data(toast),
             dismiss_reason = ToastDismissReason.NOT_DISMISSED
         )
         if self._callback_result:
@@ -857,13 +1113,13 @@ class Toast:
         toast : "ToastNotification", 
         args : "ToastDismissedEventArgs"
     ):
-        self._fs.close()
+        self._close_fs()
         winsound.PlaySound(None, 4)
         result = ToastResult(
             arguments = "", 
             inputs = {},
-            show_data = {} if not toast.data else dict(toast.data.values.items()), 
-            dismiss_reason = ToastDismissReason(args.reason.value)
+            show_data = self._get_show_data(toast), 
+            dismiss_reason = DISMISS_REASONS[args.reason.value]
         )
         if self._callback_result:
             self._callback_result(result)
@@ -875,51 +1131,97 @@ class Toast:
         toast : "ToastNotification",
         args : "ToastFailedEventArgs"
     ):
-        self._fs.close()
+        self._close_fs()
         winsound.PlaySound(None, 4)
         raise RuntimeError(
             "Toast failed with error code: " + args.error_code.value
         )
 
 
+    def _close_fs(self) -> None:
+        """
+        Deletes the temporary files of the toast, if there are any.
+        """
+        fs = self._fs
+        if fs is not None:
+            self._fs = None
+            fs.close()
+
+
+    @staticmethod
+    def _get_show_data(toast : "ToastNotification") -> Mapping:
+        """
+        Returns the binding values that the toast has shown with.
+        """
+        return ToastDataView(toast.data.values) if toast.data else EMPTY_DATA
+
+
     @staticmethod
     def _build_notification_data(
         data : dict
     ) -> "NotificationData":
-        x = NotificationData()
-        for k, v in data.items():
-            x.values[str(k)] = str(v)
+        x = notifications.NotificationData()
+        values = x.values
+        # Most of the time, data is already given as strings.
+        if all((type(k) is str) and (type(v) is str) for k, v in data.items()):
+            for k, v in data.items():
+                values[k] = v
+        else:
+            for k, v in data.items():
+                values[str(k)] = str(v)
         return x
 
 
     @staticmethod
     def _walk_elements(
-        elements : ToastElementsListType,
-    ) -> Generator[Union[ToastElement, ToastElementWalkLevelType], None, None]:
-        for i in elements:
-            if isinstance(i, list):
-                yield LEVEL_START
-                for j in Toast._walk_elements(i):
-                    yield j
-                yield LEVEL_END
-            elif not isinstance(i, ToastElement):
-                raise TypeError(
-                    f"Item must be a type of ToastElement: '{repr(i)}'"
-                )
+        elements : ToastElementsListType
+    ) -> Generator[ToastElementWalkEventType, None, None]:
+        """
+        Walk elements and yield (kind, value) tuples, where value is either 
+        the element or the opening or closing tag of a group/subgroup.
+        """
+        # Iterators of the lists that are currently being walked, so the
+        # length of the stack is the nesting level of the last list.
+        stack = [iter(elements)]
+        while stack:
+            for i in stack[-1]:
+                # Most items are elements, so check for them first.
+                if isinstance(i, ToastElement):
+                    yield WALK_ELEMENT, i,
+                elif isinstance(i, list):
+                    level = len(stack)
+                    if level > 2:
+                        raise ValueError(
+                            "Toasts doesn't support nested elements other " +
+                            "than groups and subgroups."
+                        )
+                    yield WALK_LEVEL_START, LEVEL_TAGS_START[level],
+                    stack.append(iter(i))
+                    break
+                else:
+                    raise TypeError(
+                        f"Item must be a type of ToastElement: '{repr(i)}'"
+                    )
             else:
-                yield i
+                stack.pop()
+                if stack:
+                    yield WALK_LEVEL_END, LEVEL_TAGS_END[len(stack)],
     
 
     @staticmethod
     def elements_from_json(
         elements : ToastElementsListJSONType
     ):
-        for i in elements:
-            if isinstance(i, list):
-                for j in Toast.elements_from_json(i):
-                    yield j
+        create = ToastElement._create_from_type
+        stack = [iter(elements)]
+        while stack:
+            for i in stack[-1]:
+                if isinstance(i, list):
+                    stack.append(iter(i))
+                    break
+                yield create(**i)
             else:
-                yield ToastElement._create_from_type(**i)
+                stack.pop()
 
     # --------------------
     # Misc
@@ -938,52 +1240,66 @@ class Toast:
                 Dictionary for toast data. Use "elements" key to define toast elements.
                 Element types are defined with "_type" key.
         """
+        get = json.get
         toast = cls(
-            duration = get_enum(ToastDuration, json.get("duration", None)),
-            arguments = json.get("arguments", None),
-            scenario = get_enum(ToastScenario, json.get("scenario", None)),
-            group_id = str(json.get("group_id", "")) or None,
-            toast_id = str(json.get("toast_id", "")) or None,
-            show_popup = bool(json.get("show_popup", True)),
-            base_path = str(json.get("base_path", "")) or None,
-            timestamp = None if "timestamp" not in json else \
-                datetime.fromisoformat(json["timestamp"]),
-            sound = json.get("sound", ToastSound.DEFAULT),
-            sound_loop = bool(json.get("sound_loop", False)),
-            remote_media = bool(json.get("remote_media", True)),
-            add_query_params = bool(json.get("add_query_params", False)),
-            expiration_time = None if "expiration_time" not in json else \
-                datetime.fromisoformat(json["expiration_time"]),
-            app_id = str(json.get("app_id", "")) or None
+            duration = get_enum(ToastDuration, get("duration", None)),
+            arguments = get("arguments", None),
+            scenario = get_enum(ToastScenario, get("scenario", None)),
+            group_id = str(get("group_id", "")) or None,
+            toast_id = str(get("toast_id", "")) or None,
+            show_popup = bool(get("show_popup", True)),
+            base_path = str(get("base_path", "")) or None,
+            timestamp = parse_datetime(timestamp) \
+                if (timestamp := get("timestamp", None)) else None,
+            sound = get("sound", ToastSound.DEFAULT),
+            sound_loop = bool(get("sound_loop", False)),
+            remote_media = bool(get("remote_media", True)),
+            add_query_params = bool(get("add_query_params", False)),
+            expiration_time = parse_datetime(expiration_time) \
+                if (expiration_time := get("expiration_time", None)) else None,
+            app_id = str(get("app_id", "")) or None
         )
         toast.elements.extend(cls.elements_from_json(json["elements"]))
         return toast
 
 
+    @classmethod
+    def from_json_bytes(
+        cls,
+        data : Union[str, bytes]
+    ):
+        """
+        Create a new Toast from a JSON document. Same as from_json(), but decodes 
+        the document first, with orjson if it is installed.
+
+        Parameters:
+            data:
+                JSON document of the toast data, see from_json().
+        """
+        return cls.from_json(json_loads(data))
+
+
     def copy(self):
         return self.__copy__()
 
 
     def __repr__(self) -> str:
         return (
-            "<{class_name} id={toast_id} "
-            "group={group_id} elements={elements}>"
-        ).format(
-            class_name = self.__class__.__name__,
-            toast_id = self.toast_id,
-            group_id = self.group_id,
-            elements = len(self.elements)
+            f"<{self.__class__.__name__} id={self.toast_id} "
+            f"group={self.group_id} elements={len(self.elements)}>"
         )
 
     def __del__(self):
-        if hasattr(self, "_fs"):
-            if self._fs:
-                self._fs.close()
+        # The slot is unset if the constructor has failed before setting it.
+        if getattr(self, "_fs", None) is not None:
+            self._close_fs()
 
     def __copy__(self) -> "Toast":
         x = Toast()
-        for i in self.__slots__:
-            if i in self._exclude_copy:
-                continue
-            setattr(x, i, getattr(self, i))
-        return x
\ No newline at end of file
+        for i, v in zip(self._copy_slots, self._copy_getter(self)):
+            setattr(x, i, v)
+        return x
+
+
+Toast._copy_slots = tuple(x for x in Toast.__slots__ if x not in Toast._exclude_copy)
+Toast._copy_getter = attrgetter(*Toast._copy_slots)
\ No newline at end of file